@@ -11,17 +11,37 @@ Usage:
 
 import os
 import json
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from types import MappingProxyType
 import streamlit as st
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+try:
+    import orjson  # Optional: faster config reads
+except ImportError:
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
 # Configuration
 CONFIG_FILE = "file_search_config.json"
 MODEL = "gemini-3-flash-preview"
+ANSWER_CACHE_TTL = 3600  # seconds
+ANSWER_CACHE_MAX_ENTRIES = 500
+
+# Store details used when there is no local config file (read-only, shared across reruns)
+STORE_DISPLAY_NAME = 'GSPP-User-Guides'
+DEFAULT_PDF_FILES = (
+    MappingProxyType({'display_name': 'GSPP Job Planning User Guide'}),
+    MappingProxyType({'display_name': 'GSPP Sweet Editor User Guide'}),
+)
 
 # System instruction to restrict to documentation only
 SYSTEM_INSTRUCTION = """You are a documentation assistant for GSPP software. 
@@ -36,16 +56,16 @@ CRITICAL RULES:
 
 Be helpful and precise, but never fabricate information that isn't in the documentation."""
 
+# Key names the API might use for grounding data (snake_case or camelCase)
+_CHUNKS_KEYS = ('grounding_chunks', 'groundingChunks')
+_SUPPORTS_KEYS = ('grounding_supports', 'groundingSupports')
+_CHUNK_INDICES_KEYS = ('grounding_chunk_indices', 'groundingChunkIndices')
+_CONTEXT_KEYS = ('retrieved_context', 'retrievedContext')
+_TITLE_KEYS = ('title', 'displayName')
+_TEXT_KEYS = ('text', 'content')
 
-# Page config
-st.set_page_config(
-    page_title="GSPP User Guides Search",
-    page_icon="📚",
-    layout="wide"
-)
-
-# Custom CSS
-st.markdown("""
+# Custom CSS and page header, injected together in a single element
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -80,43 +100,80 @@ st.markdown("""
         white-space: pre-wrap;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+HEADER_HTML = """
+<h1 class="main-header">📚 GSPP User Guides Search</h1>
+<p class="sub-header">Ask questions about the Job Planning Application and Sweet Editor</p>
+"""
+
+
+# Page config
+st.set_page_config(
+    page_title="GSPP User Guides Search",
+    page_icon="📚",
+    layout="wide"
+)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def read_config_file():
+    """Read the config written by setup.py, or None if there is none."""
+    config_path = Path(CONFIG_FILE)
+    if not config_path.exists():
+        return None
+    data = config_path.read_bytes()
+    return orjson.loads(data) if orjson else json.loads(data)
 
 
 def load_config():
     """Load configuration from setup, secrets, or user input."""
     # Try local config file first
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
+    config = read_config_file()
+    if config is not None:
+        return config
     
     # Fall back to Streamlit secrets (for cloud deployment)
     if hasattr(st, 'secrets') and 'STORE_NAME' in st.secrets:
         return {
             'store_name': st.secrets['STORE_NAME'],
-            'store_display_name': 'GSPP-User-Guides',
-            'pdf_files': [
-                {'display_name': 'GSPP Job Planning User Guide'},
-                {'display_name': 'GSPP Sweet Editor User Guide'},
-            ]
+            'store_display_name': STORE_DISPLAY_NAME,
+            'pdf_files': DEFAULT_PDF_FILES,
         }
     
     # Check if user has entered store name in this session
     if 'user_store_name' in st.session_state and st.session_state.user_store_name:
         return {
             'store_name': st.session_state.user_store_name,
-            'store_display_name': 'GSPP-User-Guides',
-            'pdf_files': [
-                {'display_name': 'GSPP Job Planning User Guide'},
-                {'display_name': 'GSPP Sweet Editor User Guide'},
-            ]
+            'store_display_name': STORE_DISPLAY_NAME,
+            'pdf_files': DEFAULT_PDF_FILES,
         }
     
     return None
 
 
+def _validate_store_id():
+    """Text input callback: check the Store ID format as soon as it changes."""
+    store_name = st.session_state.get("_store_id_draft", "")
+    st.session_state.store_id_valid = store_name.startswith("fileSearchStores/")
+
+
+def _submit_store_id():
+    """Button callback: accept the Store ID for this session if it is valid.
+
+    The text input and button callbacks can run in the same rerun, so the
+    format is checked again here rather than trusting an earlier result.
+    """
+    _validate_store_id()
+    if st.session_state.store_id_valid:
+        st.session_state.user_store_name = st.session_state._store_id_draft
+
+
 def prompt_for_store_name():
     """Display a prompt for users to enter the store name."""
+    # Re-check the disk on the next run in case setup.py has written a config since
+    read_config_file.clear()
+    
     st.markdown("""
     <div style="text-align: center; padding: 2rem;">
         <h1 style="color: #667eea;">🔐 Access Required</h1>
@@ -128,20 +185,22 @@ def prompt_for_store_name():
     
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        store_name = st.text_input(
+        st.text_input(
             "Store ID",
+            key="_store_id_draft",
+            on_change=_validate_store_id,
             placeholder="fileSearchStores/...",
             help="Contact your administrator for access"
         )
         
-        if st.button("🔓 Access Guides", use_container_width=True):
-            if store_name and store_name.startswith("fileSearchStores/"):
-                st.session_state.user_store_name = store_name
-                st.rerun()
-            elif store_name:
-                st.error("⚠️ Invalid Store ID format. It should start with 'fileSearchStores/'")
-            else:
-                st.warning("Please enter a Store ID")
+        if st.session_state.get("_store_id_draft") and not st.session_state.get("store_id_valid"):
+            st.error("⚠️ Invalid Store ID format. It should start with 'fileSearchStores/'")
+        
+        st.button(
+            "🔓 Access Guides",
+            on_click=_submit_store_id,
+            use_container_width=True
+        )
 
 
 @st.cache_resource
@@ -154,132 +213,233 @@ def get_client():
     return genai.Client(api_key=api_key)
 
 
-def query_guides(client, store_name, question):
-    """Query the user guides."""
-    response = client.models.generate_content(
+@st.cache_resource
+def get_generate_config(store_name):
+    """Build the File Search generation config once per store."""
+    return types.GenerateContentConfig(
+        system_instruction=SYSTEM_INSTRUCTION,
+        tools=[
+            types.Tool(
+                file_search=types.FileSearch(
+                    file_search_store_names=[store_name]
+                )
+            )
+        ]
+    )
+
+
+def query_guides_stream(client, store_name, question):
+    """Query the user guides, yielding response chunks as they arrive."""
+    yield from client.models.generate_content_stream(
         model=MODEL,
         contents=question,
-        config=types.GenerateContentConfig(
-            system_instruction=SYSTEM_INSTRUCTION,
-            tools=[
-                types.Tool(
-                    file_search=types.FileSearch(
-                        file_search_store_names=[store_name]
-                    )
-                )
-            ]
-        )
+        config=get_generate_config(store_name)
     )
-    return response
 
 
-def extract_citations(response, show_debug=False):
-    """Extract citations with section information."""
-    citations = []
-    debug_info = {}
+@st.cache_resource
+def get_answer_cache():
+    """Answers shared across sessions, keyed by (store_name, question).
+
+    Entries are kept oldest first; the lock guards the cache because each
+    session runs in its own thread.
+    """
+    return OrderedDict(), threading.Lock()
+
+
+def get_cached_answer(store_name, question):
+    """Return a cached answer if it is younger than ANSWER_CACHE_TTL."""
+    cache, lock = get_answer_cache()
+    with lock:
+        entry = cache.get((store_name, question))
+    if entry and time.time() - entry[0] < ANSWER_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def cache_answer(store_name, question, result):
+    """Cache the plain-dict projection of an answer, evicting old entries."""
+    cache, lock = get_answer_cache()
+    now = time.time()
+    with lock:
+        cache[(store_name, question)] = (now, result)
+        cache.move_to_end((store_name, question))
+        
+        # Drop expired entries from the front, then cap the total size
+        while cache and now - next(iter(cache.values()))[0] >= ANSWER_CACHE_TTL:
+            cache.popitem(last=False)
+        while len(cache) > ANSWER_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+
+def summarize_response(answer, response):
+    """Project an answer and its grounded response into plain data.
+
+    The raw response object is not safely picklable, so only the answer
+    text, citations and raw grounding metadata (as JSON-ready dicts) are kept.
+    """
+    metadata = grounding_metadata_dict(response)
+    citations = extract_citations(metadata)
+    grounding = {
+        'grounding_chunks': _first_key(metadata, _CHUNKS_KEYS) or [],
+        'grounding_supports': _first_key(metadata, _SUPPORTS_KEYS) or [],
+    }
     
-    if not response.candidates:
-        debug_info['error'] = 'No candidates in response'
-        return citations, debug_info
+    return {
+        'answer': answer,
+        'citations': citations,
+        'grounding': grounding,
+    }
+
+
+def stream_answer(client, store_name, question):
+    """Stream the answer into the page and return its plain-dict projection."""
+    received = []
     
-    candidate = response.candidates[0]
-    metadata = getattr(candidate, 'grounding_metadata', None)
+    with st.spinner("Searching user guides..."):
+        stream = query_guides_stream(client, store_name, question)
+        first_chunk = next(stream, None)
     
-    if not metadata:
-        debug_info['error'] = 'No grounding_metadata in candidate'
-        debug_info['candidate_attrs'] = [attr for attr in dir(candidate) if not attr.startswith('_')]
-        return citations, debug_info
+    def text_chunks():
+        if first_chunk is None:
+            return
+        for chunk in itertools.chain([first_chunk], stream):
+            received.append(chunk)
+            if chunk.text:
+                yield chunk.text
     
-    # Log all metadata attributes for debugging
-    debug_info['metadata_attrs'] = [attr for attr in dir(metadata) if not attr.startswith('_')]
+    answer = st.write_stream(text_chunks())
     
-    # Try different attribute names the API might use
-    grounding_chunks = (
-        getattr(metadata, 'grounding_chunks', None) or
-        getattr(metadata, 'groundingChunks', None) or
-        []
+    # Grounding metadata is attached to the final chunks of the stream
+    grounded = next(
+        (c for c in reversed(received) if c.candidates and c.candidates[0].grounding_metadata),
+        None
     )
+    return summarize_response(answer, grounded)
+
+
+def _first_key(data, keys):
+    """Return the first truthy value of data among keys, or None."""
+    for key in keys:
+        value = data.get(key)
+        if value:
+            return value
+    return None
+
+
+def grounding_metadata_dict(response):
+    """Return the first candidate's grounding metadata as a plain dict.
+
+    Converting once up front lets citation extraction use plain dict lookups
+    instead of probing SDK objects attribute by attribute.
+    """
+    if response is None or not response.candidates:
+        return {}
     
-    grounding_supports = (
-        getattr(metadata, 'grounding_supports', None) or
-        getattr(metadata, 'groundingSupports', None) or
-        []
-    )
+    metadata = getattr(response.candidates[0], 'grounding_metadata', None)
+    if not metadata:
+        return {}
     
-    # Also check for retrieval_metadata (alternative structure)
-    retrieval_metadata = getattr(metadata, 'retrieval_metadata', None)
-    if retrieval_metadata:
-        debug_info['has_retrieval_metadata'] = True
-        debug_info['retrieval_metadata_attrs'] = [attr for attr in dir(retrieval_metadata) if not attr.startswith('_')]
+    try:
+        return metadata.to_json_dict()
+    except AttributeError:
+        return metadata.model_dump(mode='json', exclude_none=True)
+
+
+def extract_citations(metadata):
+    """Extract citations with section information from grounding metadata."""
+    citations = []
+    
+    if not metadata:
+        return citations
+    
+    # Try different key names the API might use
+    grounding_chunks = _first_key(metadata, _CHUNKS_KEYS) or []
+    grounding_supports = _first_key(metadata, _SUPPORTS_KEYS) or []
     
-    debug_info['grounding_chunks_count'] = len(grounding_chunks) if grounding_chunks else 0
-    debug_info['grounding_supports_count'] = len(grounding_supports) if grounding_supports else 0
+    # Resolve the chunks each support cites before reading any chunk
+    support_indices = [
+        _first_key(support, _CHUNK_INDICES_KEYS) or []
+        for support in grounding_supports
+    ]
+    referenced = {idx for indices in support_indices for idx in indices}
     
-    # Build chunk info map
+    # Build chunk info map, skipping chunks that no support refers to
     chunk_info = {}
     for i, chunk in enumerate(grounding_chunks):
+        if grounding_supports and i not in referenced:
+            continue
+        
         info = {'index': i}
-        chunk_attrs = [attr for attr in dir(chunk) if not attr.startswith('_')]
-        debug_info[f'chunk_{i}_attrs'] = chunk_attrs
         
-        # Try different attribute names for retrieved context
-        ctx = (
-            getattr(chunk, 'retrieved_context', None) or
-            getattr(chunk, 'retrievedContext', None)
-        )
+        # Try different key names for retrieved context
+        ctx = _first_key(chunk, _CONTEXT_KEYS)
         
         if ctx:
-            info['title'] = getattr(ctx, 'title', '') or getattr(ctx, 'displayName', 'Unknown Source')
-            info['uri'] = getattr(ctx, 'uri', '')
+            info['title'] = _first_key(ctx, _TITLE_KEYS) or 'Unknown Source'
+            info['uri'] = ctx.get('uri', '')
         
         # Get chunk text
-        info['text'] = getattr(chunk, 'text', '') or getattr(chunk, 'content', '')
+        info['text'] = _first_key(chunk, _TEXT_KEYS) or ''
         
-        chunk_info[i] = info
-    
-    # If we have chunks but no supports, just use chunks directly
-    if grounding_chunks and not grounding_supports:
-        for i, info in chunk_info.items():
+        # If we have chunks but no supports, just use chunks directly
+        if not grounding_supports:
             if info.get('text') or info.get('title'):
                 citations.append({
                     'title': info.get('title', 'Source Document'),
                     'source_text': info.get('text', ''),
                     'uri': info.get('uri', ''),
                 })
-    else:
-        # Process grounding supports
-        for support in grounding_supports:
-            chunk_indices = (
-                getattr(support, 'grounding_chunk_indices', []) or
-                getattr(support, 'groundingChunkIndices', []) or
-                []
-            )
-            
-            for idx in chunk_indices:
-                if idx in chunk_info:
-                    info = chunk_info[idx]
-                    citations.append({
-                        'title': info.get('title', 'Unknown'),
-                        'source_text': info.get('text', ''),
-                        'uri': info.get('uri', ''),
-                    })
+        else:
+            chunk_info[i] = info
+    
+    # Process grounding supports
+    for indices in support_indices:
+        for idx in indices:
+            if idx in chunk_info:
+                info = chunk_info[idx]
+                citations.append({
+                    'title': info.get('title', 'Unknown'),
+                    'source_text': info.get('text', ''),
+                    'uri': info.get('uri', ''),
+                })
     
     # Deduplicate
     seen = set()
     unique_citations = []
     for c in citations:
-        key = (c['title'], c['source_text'][:100] if c['source_text'] else '')
+        # Key on the full text rather than slicing a 100-char prefix per citation
+        key = (c['title'], c['source_text'])
         if key not in seen:
             seen.add(key)
             unique_citations.append(c)
     
-    return unique_citations, debug_info
+    return unique_citations
+
+
+def render_grounding(grounding):
+    """Show raw grounding metadata stored alongside an assistant answer."""
+    if not st.session_state.get("show_raw", False):
+        return
+    if grounding and (grounding['grounding_chunks'] or grounding['grounding_supports']):
+        with st.expander("🔧 Raw Grounding Metadata", expanded=False):
+            st.json(grounding)
+
+
+def render_message(message):
+    """Render a chat message from its stored fields, without re-querying."""
+    st.markdown(message["content"])
+    render_grounding(message.get("grounding"))
+
+
+def _set_question(question):
+    """Button callback: queue an example question before the script reruns."""
+    st.session_state.question = question
 
 
 def main():
-    # Header
-    st.markdown('<h1 class="main-header">📚 GSPP User Guides Search</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="sub-header">Ask questions about the Job Planning Application and Sweet Editor</p>', unsafe_allow_html=True)
+    # Styles and header
+    st.markdown(CUSTOM_CSS + HEADER_HTML, unsafe_allow_html=True)
     
     # Load config
     config = load_config()
@@ -301,6 +461,7 @@ def main():
         st.markdown("### ⚙️ Settings")
         st.markdown(f"**Model:** `{MODEL}`")
         st.markdown("**Mode:** Documentation-only")
+        st.checkbox("🔧 Show raw grounding metadata", key="show_raw")
         
         st.markdown("---")
         st.markdown("### 💡 Example Questions")
@@ -311,62 +472,52 @@ def main():
             "What file formats are supported?",
         ]
         for example in examples:
-            if st.button(example, key=example):
-                st.session_state.question = example
+            st.button(example, key=example, on_click=_set_question, args=(example,))
     
     # Chat history
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    st.session_state.setdefault("messages", [])
     
     # Display history
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+            render_message(message)
     
     # Chat input
     question = st.chat_input("Ask a question about the GSPP user guides...")
     
-    if "question" in st.session_state and st.session_state.question:
-        question = st.session_state.question
-        st.session_state.question = None
+    # An example question picked in the sidebar takes precedence
+    question = st.session_state.pop("question", None) or question
     
     if question:
-        st.session_state.messages.append({"role": "user", "content": question})
-        with st.chat_message("user"):
-            st.markdown(question)
+        # A rerun stops the previous run, so a resubmitted question that is still
+        # unanswered is answered here rather than appended a second time
+        messages = st.session_state.messages
+        pending = bool(messages) and messages[-1] == {"role": "user", "content": question}
+        if not pending:
+            messages.append({"role": "user", "content": question})
+            with st.chat_message("user"):
+                st.markdown(question)
         
         with st.chat_message("assistant"):
-            with st.spinner("Searching user guides..."):
-                try:
-                    response = query_guides(client, store_name, question)
-                    answer = response.text
-                    citations, debug_info = extract_citations(response)
-                    
-                    st.markdown(answer)
-                    
-                    # Show raw grounding metadata (expanded by default)
-                    if response.candidates:
-                        metadata = response.candidates[0].grounding_metadata
-                        if metadata:
-                            chunks = getattr(metadata, 'grounding_chunks', []) or []
-                            supports = getattr(metadata, 'grounding_supports', []) or []
-                            with st.expander("🔧 Raw Grounding Metadata", expanded=False):
-                                # Build clean output without empty lines
-                                output = {
-                                    'grounding_chunks': [str(c) for c in chunks] if chunks else [],
-                                    'grounding_supports': [str(s) for s in supports] if supports else [],
-                                }
-                                st.json(output)
-                    
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": answer
-                    })
-                    
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-                    import traceback
-                    st.code(traceback.format_exc())
+            try:
+                result = get_cached_answer(store_name, question)
+                if result is None:
+                    result = stream_answer(client, store_name, question)
+                    cache_answer(store_name, question, result)
+                else:
+                    st.markdown(result['answer'])
+                render_grounding(result['grounding'])
+                
+                messages.append({
+                    "role": "assistant",
+                    "content": result['answer'],
+                    "grounding": result['grounding'],
+                })
+                
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+                import traceback
+                st.code(traceback.format_exc())
 
 
 if __name__ == "__main__":
@@ -14,10 +14,18 @@ Usage:
 
 import os
 import time
+import json
+import hashlib
+from pathlib import Path
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+try:
+    import orjson  # Optional: faster config reads and writes
+except ImportError:
+    orjson = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -27,6 +35,7 @@ PDF_FILES = [
     ("user guides/GSPP Sweet Editor User Guide.pdf", "GSPP Sweet Editor User Guide"),
 ]
 STORE_NAME = "GSPP-User-Guides"
+CONFIG_FILE = "file_search_config.json"
 MODEL = "gemini-3-flash-preview"
 
 
@@ -38,6 +47,84 @@ def get_client():
     return genai.Client(api_key=api_key)
 
 
+def file_sha256(file_path):
+    """Compute the SHA-256 of a file so changed PDFs can be detected."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_config_if_exists():
+    """Return the saved config, or None if there is no usable config file."""
+    if not os.path.exists(CONFIG_FILE):
+        return None
+    
+    try:
+        data = Path(CONFIG_FILE).read_bytes()
+        config = orjson.loads(data) if orjson else json.loads(data)
+        if not config.get('store_name') or not isinstance(config.get('pdf_files'), list):
+            print(f"Ignoring {CONFIG_FILE}: missing store_name or pdf_files")
+            return None
+        return config
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"Error reading {CONFIG_FILE}: {e}")
+        return None
+
+
+def changed_pdf_files(config):
+    """Return the PDF paths whose contents no longer match the saved config."""
+    cached_hashes = {pdf.get('path'): pdf.get('sha256') for pdf in config['pdf_files']}
+    changed = []
+    for file_path, _ in PDF_FILES:
+        cached_hash = cached_hashes.get(file_path)
+        if not cached_hash:
+            # No recorded hash (older config or reused store): unknown, not changed
+            continue
+        if not os.path.exists(file_path):
+            print(f"PDF not found, cannot check it for changes: {file_path}")
+            continue
+        if cached_hash != file_sha256(file_path):
+            changed.append(file_path)
+    return changed
+
+
+def save_config(store_name, indexed=True):
+    """Save configuration to file for use by the app.
+
+    PDF hashes are only recorded when the store was just indexed from these
+    files; for a reused store they are left unknown (None).
+    """
+    config = {
+        "store_name": store_name,
+        "store_display_name": STORE_NAME,
+        "pdf_files": [
+            {
+                "path": path,
+                "display_name": name,
+                "sha256": file_sha256(path) if indexed and os.path.exists(path) else None,
+            }
+            for path, name in PDF_FILES
+        ],
+        "sdk_version": genai.__version__,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    if orjson:
+        data = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(config, indent=2).encode('utf-8')
+    
+    # Write to a temporary file and swap it in, so an interrupted write
+    # never leaves a truncated config behind
+    tmp_path = Path(CONFIG_FILE + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, CONFIG_FILE)
+    
+    print(f"\nConfiguration saved to: {CONFIG_FILE}")
+
+
 def find_existing_store(client, display_name):
     """Check if a store with the given display name already exists."""
     try:
@@ -52,11 +139,39 @@ def find_existing_store(client, display_name):
 
 def create_store_and_upload_files(client):
     """Create a File Search store and upload all PDF files."""
-    # Check for existing store
-    existing_store = find_existing_store(client, STORE_NAME)
-    if existing_store:
-        print(f"\nUsing existing store: {existing_store.name}")
-        return existing_store.name
+    # Check the saved config before listing stores remotely
+    config = load_config_if_exists()
+    if config:
+        store_name = config['store_name']
+        changed = changed_pdf_files(config)
+        if not changed:
+            print(f"\nUsing store from {CONFIG_FILE}: {store_name}")
+            return store_name
+        
+        # The saved store still holds the old index; only replace it if asked to
+        # and every PDF is available to re-upload
+        print(f"\nPDF files changed since {store_name} was indexed: {', '.join(changed)}")
+        missing = [path for path, _ in PDF_FILES if not os.path.exists(path)]
+        if missing:
+            print(f"Cannot re-index, PDF files not found: {', '.join(missing)}")
+            print(f"Using store from {CONFIG_FILE} as-is: {store_name}")
+            return store_name
+        
+        response = input("\nDelete this store and re-index the PDFs? (y/n): ").strip().lower()
+        if response != 'y':
+            print(f"Using store from {CONFIG_FILE} as-is: {store_name}")
+            return store_name
+        
+        print("Deleting stale store...")
+        client.file_search_stores.delete(name=store_name, config={'force': True})
+        print("Deleted.")
+    else:
+        # Check for existing store; its index is not known to match the PDFs,
+        # so it is used without recording their hashes
+        existing_store = find_existing_store(client, STORE_NAME)
+        if existing_store:
+            print(f"\nUsing existing store: {existing_store.name}")
+            return existing_store.name
     
     # Create new store
     print(f"\nCreating new File Search store: {STORE_NAME}")
@@ -65,7 +180,8 @@ def create_store_and_upload_files(client):
     )
     print(f"Created store: {file_search_store.name}")
     
-    # Upload each PDF file
+    # Start every upload first so the files are indexed concurrently
+    operations = []
     for file_path, display_name in PDF_FILES:
         print(f"\nUploading: {display_name}")
         print(f"  File: {file_path}")
@@ -75,16 +191,26 @@ def create_store_and_upload_files(client):
             file_search_store_name=file_search_store.name,
             config={"display_name": display_name}
         )
-        
-        # Wait for the upload and indexing to complete
-        print("  Indexing...", end="", flush=True)
-        while not operation.done:
+        operations.append((display_name, operation))
+    
+    # Wait for all uploads and indexing to complete
+    print("\nIndexing...", end="", flush=True)
+    while operations:
+        pending = []
+        for display_name, operation in operations:
+            operation = client.operations.get(operation)
+            if operation.done:
+                print(f"\n  {display_name} done!", end="", flush=True)
+            else:
+                pending.append((display_name, operation))
+        operations = pending
+        if operations:
             time.sleep(5)
             print(".", end="", flush=True)
-            operation = client.operations.get(operation)
-        print(" Done!")
+    print()
     
     print(f"\nAll files uploaded and indexed successfully!")
+    save_config(file_search_store.name)
     return file_search_store.name
 
 
@@ -15,9 +15,16 @@ Usage:
 import os
 import time
 import json
+import hashlib
+from pathlib import Path
 from dotenv import load_dotenv
 from google import genai
 
+try:
+    import orjson  # Optional: faster config reads and writes
+except ImportError:
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
@@ -50,7 +57,10 @@ def find_existing_store(client, display_name):
 
 
 def create_store_and_upload_files(client):
-    """Create a File Search store and upload all PDF files."""
+    """Create a File Search store and upload all PDF files.
+
+    Returns the store name and whether the PDFs were indexed in this run.
+    """
     
     # Check for existing store
     print(f"\nChecking for existing store: {STORE_NAME}")
@@ -60,7 +70,7 @@ def create_store_and_upload_files(client):
         print(f"✅ Found existing store: {existing_store.name}")
         response = input("\nDo you want to use the existing store? (y/n): ").strip().lower()
         if response == 'y':
-            return existing_store.name
+            return existing_store.name, False
         else:
             print("Deleting existing store...")
             client.file_search_stores.delete(name=existing_store.name, config={'force': True})
@@ -73,7 +83,8 @@ def create_store_and_upload_files(client):
     )
     print(f"✅ Created store: {file_search_store.name}")
     
-    # Upload each PDF file
+    # Start every upload first so the files are indexed concurrently
+    operations = []
     for file_path, display_name in PDF_FILES:
         print(f"\n📄 Uploading: {display_name}")
         print(f"   File: {file_path}")
@@ -90,32 +101,67 @@ def create_store_and_upload_files(client):
             file_search_store_name=file_search_store.name,
             config={"display_name": display_name}
         )
-        
-        # Wait for the upload and indexing to complete
-        print("   Indexing", end="", flush=True)
-        while not operation.done:
+        operations.append((display_name, operation))
+    
+    # Wait for all uploads and indexing to complete
+    print("\n⏳ Indexing", end="", flush=True)
+    while operations:
+        pending = []
+        for display_name, operation in operations:
+            operation = client.operations.get(operation)
+            if operation.done:
+                print(f"\n   ✅ {display_name} indexed", end="", flush=True)
+            else:
+                pending.append((display_name, operation))
+        operations = pending
+        if operations:
             time.sleep(3)
             print(".", end="", flush=True)
-            operation = client.operations.get(operation)
-        print(" ✅ Done!")
+    print("\n   ✅ Done!")
     
-    return file_search_store.name
+    return file_search_store.name, True
+
+
+def file_sha256(file_path):
+    """Compute the SHA-256 of a file so changed PDFs can be detected."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
 
-def save_config(store_name):
-    """Save configuration to file for use by the app."""
+def save_config(store_name, indexed=True):
+    """Save configuration to file for use by the app.
+
+    PDF hashes are only recorded when the store was just indexed from these
+    files; for a reused store they are left unknown (None).
+    """
     config = {
         "store_name": store_name,
         "store_display_name": STORE_NAME,
         "pdf_files": [
-            {"path": path, "display_name": name}
+            {
+                "path": path,
+                "display_name": name,
+                "sha256": file_sha256(path) if indexed and os.path.exists(path) else None,
+            }
             for path, name in PDF_FILES
         ],
+        "sdk_version": genai.__version__,
         "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    if orjson:
+        data = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(config, indent=2).encode('utf-8')
+    
+    # Write to a temporary file and swap it in, so an interrupted write
+    # never leaves a truncated config behind
+    tmp_path = Path(CONFIG_FILE + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, CONFIG_FILE)
     
     print(f"\n💾 Configuration saved to: {CONFIG_FILE}")
 
@@ -150,10 +196,10 @@ def main():
         return
     
     # Create store and upload files
-    store_name = create_store_and_upload_files(client)
+    store_name, indexed = create_store_and_upload_files(client)
     
     # Save configuration
-    save_config(store_name)
+    save_config(store_name, indexed)
     
     print("\n" + "=" * 60)
     print("✅ Setup Complete!")